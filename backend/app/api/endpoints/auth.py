@@ -2,18 +2,26 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from passlib.context import CryptContext
+from functools import lru_cache
 from typing import List
 
+from ...core.cache import replay_cache
 from ...database import get_db
 from ...models.user import User
 from ...schemas.user import UserCreate, UserUpdate, User as UserSchema
 from ..deps import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """
+    第一次用到时才加载 passlib 和 bcrypt 后端
+    """
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 @router.post("/register", response_model=UserSchema, status_code=status.HTTP_201_CREATED)
 def register(user: UserCreate, db: Session = Depends(get_db)):
     """
@@ -33,7 +41,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
             detail="Email already registered"
         )
     
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = get_pwd_context().hash(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -50,7 +58,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     OAuth2 compatible token login, get an access token for future requests.
     """
     user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+    if not user or not get_pwd_context().verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -113,8 +121,10 @@ async def update_user_me(
         current_user.email = user_update.email
     
     if user_update.password:
-        current_user.hashed_password = pwd_context.hash(user_update.password)
+        current_user.hashed_password = get_pwd_context().hash(user_update.password)
     
     db.commit()
     db.refresh(current_user)
+    # 已缓存的对局响应中包含旧的用户资料
+    replay_cache.evict_user(current_user.id)
     return current_user
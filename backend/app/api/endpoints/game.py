@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.orm.attributes import flag_modified
+from typing import List, Optional
 from datetime import datetime
+import asyncio
 
+from ...core import positions
+from ...core.rules import check_win, is_valid_move
+from ...core.archive import archive
+from ...core.cache import cached_response, replay_cache
 from ...database import get_db
-from ...models.game import Game, GameMove, GameStatus
-from ...schemas.game import GameCreate, Game as GameSchema, GameMove as GameMoveSchema, GameDetail
+from ...models.game import Game, GameMove, GameStatus, PositionEntry
+from ...schemas.game import (
+    GameCreate, Game as GameSchema, GameMove as GameMoveSchema, GameDetail, ExplorerMove, ExplorerResult,
+    GameStats, PlayerStats
+)
+from ...schemas.user import User as UserSchema
 from ..deps import get_current_user
 from ...models.user import User
 
@@ -43,18 +54,49 @@ async def create_room(
 @router.get("/rooms/{game_id}", response_model=GameDetail)
 async def get_room(
     game_id: int,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
     获取特定游戏房间的详细信息
+    已结束的对局序列化一次后缓存，并带 ETag 返回；玩家资料修改时清除
     """
-    game = db.query(Game).filter(Game.id == game_id).first()
-    if not game:
+    entry = replay_cache.get(game_id)
+    if entry is None:
+        game = db.query(Game).filter(Game.id == game_id).first()
+        if game:
+            if game.status != GameStatus.FINISHED:
+                return game
+            detail = GameDetail.model_validate(game)
+        else:
+            # 已结束的对局可能已被移到归档文件
+            detail = _archived_detail(db, game_id)
+        entry = replay_cache.put(
+            game_id,
+            detail.model_dump_json().encode(),
+            user_ids=(detail.player1_id, detail.player2_id, detail.current_turn_id, detail.winner_id)
+        )
+    return cached_response(entry, if_none_match)
+
+def _archived_detail(db: Session, game_id: int) -> GameDetail:
+    archived = archive.get(game_id)
+    if not archived:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Game not found"
         )
-    return game
+    user_ids = {archived["player1_id"], archived["player2_id"], archived["current_turn_id"], archived["winner_id"]}
+    users = {
+        user.id: UserSchema.model_validate(user)
+        for user in db.query(User).filter(User.id.in_(user_ids - {None})).all()
+    }
+    return GameDetail(
+        **archived,
+        player1=users.get(archived["player1_id"]),
+        player2=users.get(archived["player2_id"]),
+        current_turn=users.get(archived["current_turn_id"]),
+        winner=users.get(archived["winner_id"]),
+    )
 
 @router.post("/rooms/{game_id}/join", response_model=GameSchema)
 async def join_room(
@@ -129,15 +171,19 @@ async def make_move(
         )
     
     # 检查位置是否已被占用
-    if game.board[move.y][move.x] != 0:
+    if not is_valid_move(game.board, move.x, move.y):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Position is already taken"
         )
     
+    # 落子前记录局面索引
+    positions.index_move(db, game, move.x, move.y)
+
     # 记录移动
     player_number = 1 if current_user.id == game.player1_id else 2
     game.board[move.y][move.x] = player_number
+    flag_modified(game, "board")
     
     # 保存移动记录
     db_move = GameMove(
@@ -153,6 +199,7 @@ async def make_move(
         game.status = GameStatus.FINISHED
         game.winner_id = current_user.id
         game.finished_at = datetime.utcnow()
+        positions.record_result(db, game)
     else:
         # 切换回合
         game.current_turn_id = game.player2_id if current_user.id == game.player1_id else game.player1_id
@@ -161,30 +208,73 @@ async def make_move(
     db.refresh(game)
     return game
 
-def check_win(board: List[List[int]], x: int, y: int, player: int) -> bool:
+@router.get("/explorer", response_model=ExplorerResult)
+async def explore_position(
+    moves: str = "",
+    db: Session = Depends(get_db)
+):
     """
-    检查是否获胜
+    开局浏览器：查询到达某个局面的所有对局，以及下一步的胜率
+    moves 为落子序列，如 "7,7;8,8"，黑方先手
     """
-    directions = [
-        [(0, 1), (0, -1)],   # 垂直
-        [(1, 0), (-1, 0)],   # 水平
-        [(1, 1), (-1, -1)],  # 主对角线
-        [(1, -1), (-1, 1)]   # 副对角线
-    ]
-    
-    for dir_pair in directions:
-        count = 1  # 当前位置算一个
-        
-        # 检查每一对方向
-        for dx, dy in dir_pair:
-            # 在这个方向上继续找相同的棋子
-            curr_x, curr_y = x + dx, y + dy
-            while (0 <= curr_x < 15 and 
-                   0 <= curr_y < 15 and 
-                   board[curr_y][curr_x] == player):
-                count += 1
-                if count >= 5:
-                    return True
-                curr_x, curr_y = curr_x + dx, curr_y + dy
-    
-    return False
+    hashes = [0] * len(positions.SYMMETRIES)
+    played = set()
+    try:
+        steps = [tuple(int(v) for v in step.split(",")) for step in moves.split(";") if step]
+    except ValueError:
+        steps = None
+    if steps is None or any(len(step) != 2 for step in steps):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid moves"
+        )
+    for ply, (x, y) in enumerate(steps):
+        if not (0 <= x < 15 and 0 <= y < 15) or (x, y) in played:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid moves"
+            )
+        played.add((x, y))
+        hashes = positions.play(hashes, x, y, ply % 2 + 1)
+
+    position_hash, s = positions.canonical(hashes)
+    mover = len(steps) % 2 + 1
+    rows = (
+        db.query(
+            PositionEntry.x,
+            PositionEntry.y,
+            func.count().label("games"),
+            func.sum(case((PositionEntry.result == mover, 1), else_=0)).label("wins"),
+        )
+        .filter(PositionEntry.position_hash == position_hash, PositionEntry.result.isnot(None))
+        .group_by(PositionEntry.x, PositionEntry.y)
+        .all()
+    )
+
+    # 索引中的坐标是规范方向的，转换回查询局面的方向
+    inverse = positions.SYMMETRIES[positions.INVERSE[s]]
+    result = []
+    for row in rows:
+        x, y = inverse(row.x, row.y)
+        result.append(ExplorerMove(x=x, y=y, games=row.games, wins=row.wins, win_rate=row.wins / row.games))
+    result.sort(key=lambda m: m.games, reverse=True)
+    return ExplorerResult(
+        position_hash=position_hash,
+        games=sum(m.games for m in result),
+        moves=result
+    )
+
+@router.get("/stats", response_model=GameStats)
+async def game_stats(user_id: Optional[int] = None):
+    """
+    已结束对局的统计，指定 user_id 时附带该用户的统计
+    """
+    # numpy 较重，第一次请求统计时再加载
+    from ...core.analytics import analytics
+
+    # 加载历史对局和 numpy 计算放到线程中，不阻塞事件循环上的 WebSocket
+    summary, player = await asyncio.to_thread(analytics.stats, archive, user_id)
+    stats = GameStats(**summary)
+    if player is not None:
+        stats.player = PlayerStats(**player)
+    return stats
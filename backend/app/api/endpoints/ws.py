@@ -1,11 +1,15 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime
 import json
 
+from ...core import positions
+from ...core.chat import chat
+from ...core.rules import check_win, is_valid_move
 from ...core.ws_manager import manager
 from ...database import get_db
-from ...models.game import Game, GameStatus
+from ...models.game import Game, GameMove, GameStatus
 from ...models.user import User
 from ..deps import get_current_user_ws
 from ...schemas.ws_events import (
@@ -70,6 +74,9 @@ async def game_ws(
             # 连接观众
             await manager.connect_spectator(websocket, game_id)
         
+        # 发送房间的聊天记录
+        await chat.send_history(websocket, game_id)
+        
         # 等待消息
         while True:
             data = await websocket.receive_json()
@@ -80,16 +87,30 @@ async def game_ws(
                     x, y = data["data"]["position"]
                     
                     # 验证移动是否合法
-                    if 0 <= x < 15 and 0 <= y < 15 and game.board[y][x] == 0:
+                    if is_valid_move(game.board, x, y):
+                        # 落子前记录局面索引
+                        positions.index_move(db, game, x, y)
+
                         # 更新游戏状态
                         player_number = 1 if current_user.id == game.player1_id else 2
                         game.board[y][x] = player_number
+                        flag_modified(game, "board")
+                        
+                        # 保存移动记录，局面索引重建和归档都依赖它
+                        db_move = GameMove(
+                            game_id=game_id,
+                            player_id=current_user.id,
+                            x=x,
+                            y=y
+                        )
+                        db.add(db_move)
                         
                         # 检查是否获胜
                         if check_win(game.board, x, y, player_number):
                             game.status = GameStatus.FINISHED
                             game.winner_id = current_user.id
                             game.finished_at = datetime.utcnow()
+                            positions.record_result(db, game)
                             
                             # 发送游戏结束事件
                             event = GameEndEvent(
@@ -117,13 +138,22 @@ async def game_ws(
             
             # 处理聊天消息
             elif data["type"] == "chat":
+                # 限制发送频率
+                if not chat.allow(current_user.id):
+                    event = ErrorEvent(
+                        code="rate_limited",
+                        message="You are sending messages too fast",
+                        timestamp=datetime.utcnow()
+                    )
+                    await manager.send_personal_message(websocket, event.model_dump(mode="json"))
+                    continue
                 event = ChatMessageEvent(
                     sender_id=current_user.id,
                     sender_name=current_user.username,
                     message=data["data"]["message"],
                     timestamp=datetime.utcnow()
                 )
-                await manager.broadcast_to_game(game_id, event.model_dump())
+                await chat.post(game_id, event)
     
     except WebSocketDisconnect:
         if is_player:
@@ -136,31 +166,7 @@ async def game_ws(
             await manager.broadcast_to_game(game_id, event.model_dump())
         else:
             manager.disconnect_spectator(websocket, game_id)
-
-def check_win(board: list[list[int]], x: int, y: int, player: int) -> bool:
-    """
-    检查是否获胜
-    """
-    directions = [
-        [(0, 1), (0, -1)],   # 垂直
-        [(1, 0), (-1, 0)],   # 水平
-        [(1, 1), (-1, -1)],  # 主对角线
-        [(1, -1), (-1, 1)]   # 副对角线
-    ]
-    
-    for dir_pair in directions:
-        count = 1  # 当前位置算一个
         
-        # 检查每一对方向
-        for dx, dy in dir_pair:
-            # 在这个方向上继续找相同的棋子
-            curr_x, curr_y = x + dx, y + dy
-            while (0 <= curr_x < 15 and 
-                   0 <= curr_y < 15 and 
-                   board[curr_y][curr_x] == player):
-                count += 1
-                if count >= 5:
-                    return True
-                curr_x, curr_y = curr_x + dx, curr_y + dy
-    
-    return False
+        # 房间没有连接了，释放聊天记录
+        if game_id not in manager.game_connections and game_id not in manager.spectator_connections:
+            chat.forget(game_id)
@@ -0,0 +1,260 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.game import Game, GameMove, GameStatus
+from .rules import BOARD_SIZE
+
+# 两次从数据库增量加载之间的最短间隔（秒）
+REFRESH_INTERVAL = 30
+# finished_at 在处理落子时设置、稍后才提交，增量加载时回看这段时间，避免漏掉晚提交的对局
+WATERMARK_GRACE = timedelta(minutes=5)
+# 最多缓存多少个用户的统计
+PLAYER_CACHE_SIZE = 1024
+# 计算获胜方向时每批处理的对局数，限制三维棋盘数组的内存
+_CHUNK = 50_000
+
+# 与 rules.check_win 中的方向顺序一致
+DIRECTIONS = ["vertical", "horizontal", "diagonal", "anti_diagonal"]
+_STEPS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+_GAME_COLUMNS = ("ids", "player1", "player2", "winner", "length", "direction", "opening1", "opening2")
+_DTYPES = {
+    "ids": np.int64,
+    "player1": np.int64,
+    "player2": np.int64,
+    "winner": np.int8,      # 胜方编号，0 表示平局
+    "length": np.int16,     # 总步数
+    "direction": np.int8,   # 获胜方向下标，-1 表示没有
+    "opening1": np.int16,   # 玩家1第一手的格子 y * 15 + x，-1 表示没有
+    "opening2": np.int16,   # 玩家2第一手的格子
+}
+
+def _win_directions(move_game: np.ndarray, xs: np.ndarray, ys: np.ndarray, players: np.ndarray,
+                    ends: np.ndarray, winner: np.ndarray) -> np.ndarray:
+    """
+    对一批对局向量化地找出最后一手连成五子的方向
+    """
+    count = len(ends)
+    boards = np.zeros((count, BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+    boards[move_game, ys, xs] = players
+
+    direction = np.full(count, -1, dtype=np.int8)
+    games = np.flatnonzero((winner > 0) & (ends >= 0))
+    if not len(games):
+        return direction
+    last = ends[games]
+    lx, ly, lp = xs[last], ys[last], players[last]
+
+    runs = np.ones((len(_STEPS), len(games)), dtype=np.int8)
+    for d, (dx, dy) in enumerate(_STEPS):
+        for sign in (1, -1):
+            alive = np.ones(len(games), dtype=bool)
+            for k in range(1, 5):
+                cx = lx + sign * k * dx
+                cy = ly + sign * k * dy
+                inside = (cx >= 0) & (cx < BOARD_SIZE) & (cy >= 0) & (cy < BOARD_SIZE)
+                cells = boards[games, np.clip(cy, 0, BOARD_SIZE - 1), np.clip(cx, 0, BOARD_SIZE - 1)]
+                alive &= inside & (cells == lp)
+                runs[d] += alive
+    won = runs >= 5
+    direction[games] = np.where(won.any(axis=0), won.argmax(axis=0), -1)
+    return direction
+
+def _summarize(game_rows: np.ndarray, move_rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    把一批对局 (id, player1, player2, winner_id) 和按对局、步数排序的移动
+    (game_id, player_id, x, y) 转成列式数组
+    """
+    ids = game_rows[:, 0]
+    player1 = game_rows[:, 1]
+    winner = np.where(game_rows[:, 3] == 0, 0, np.where(game_rows[:, 3] == player1, 1, 2))
+
+    move_game = np.searchsorted(ids, move_rows[:, 0])
+    players = np.where(move_rows[:, 1] == player1[move_game], 1, 2).astype(np.int8)
+    xs, ys = move_rows[:, 2], move_rows[:, 3]
+    cells = ys * BOARD_SIZE + xs
+
+    length = np.bincount(move_game, minlength=len(ids))
+    ends = np.cumsum(length) - 1
+    starts = ends - length + 1
+    if len(cells):
+        opening1 = np.where(length >= 1, cells[np.minimum(starts, len(cells) - 1)], -1)
+        opening2 = np.where(length >= 2, cells[np.minimum(starts + 1, len(cells) - 1)], -1)
+    else:
+        opening1 = opening2 = np.full(len(ids), -1)
+    ends = np.where(length > 0, ends, -1)
+
+    return {
+        "ids": ids,
+        "player1": player1,
+        "player2": game_rows[:, 2],
+        "winner": winner,
+        "length": length,
+        "direction": _win_directions(move_game, xs, ys, players, ends, winner),
+        "opening1": opening1,
+        "opening2": opening2,
+        "cells": np.bincount(cells, minlength=BOARD_SIZE * BOARD_SIZE),
+    }
+
+class GameAnalytics:
+    """
+    已结束对局的列式统计，增量加载并缓存计算结果
+    """
+    def __init__(self):
+        self.columns = {name: np.empty(0, dtype=_DTYPES[name]) for name in _GAME_COLUMNS}
+        # 所有落子的格子热力图
+        self.cell_counts = np.zeros(BOARD_SIZE * BOARD_SIZE, dtype=np.int64)
+        self._finished_after = None
+        self._archive_seen = 0
+        self._refreshed_at = 0.0
+        self._summary: Optional[dict] = None
+        self._players: "OrderedDict[int, dict]" = OrderedDict()
+        # 加载和计算在线程池中进行，同一时间只允许一个线程访问
+        self._lock = threading.Lock()
+
+    def _append(self, game_rows: np.ndarray, move_rows: np.ndarray):
+        # 重复的对局（例如刚被归档的）跳过
+        keep = ~np.isin(game_rows[:, 0], self.columns["ids"])
+        game_rows = game_rows[keep]
+        if not len(game_rows):
+            return
+        order = np.argsort(game_rows[:, 0], kind="stable")
+        game_rows = game_rows[order]
+        move_rows = move_rows[np.isin(move_rows[:, 0], game_rows[:, 0])]
+        move_rows = move_rows[np.argsort(move_rows[:, 0], kind="stable")]
+
+        for start in range(0, len(game_rows), _CHUNK):
+            chunk = game_rows[start:start + _CHUNK]
+            lo = np.searchsorted(move_rows[:, 0], chunk[0, 0], side="left")
+            hi = np.searchsorted(move_rows[:, 0], chunk[-1, 0], side="right")
+            summary = _summarize(chunk, move_rows[lo:hi])
+            self.cell_counts += summary.pop("cells")
+            for name in _GAME_COLUMNS:
+                self.columns[name] = np.concatenate([self.columns[name], summary[name].astype(_DTYPES[name])])
+        self._summary = None
+        self._players.clear()
+
+    def refresh(self, db: Session, archive=None, force: bool = False):
+        """
+        从数据库和归档文件增量加载新结束的对局
+        """
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < REFRESH_INTERVAL:
+            return
+        self._refreshed_at = now
+
+        query = db.query(
+            Game.id, Game.player1_id, Game.player2_id, func.coalesce(Game.winner_id, 0), Game.finished_at
+        ).filter(Game.status == GameStatus.FINISHED)
+        if self._finished_after is not None:
+            query = query.filter(Game.finished_at >= self._finished_after - WATERMARK_GRACE)
+        games = query.all()
+        if games:
+            finished = [row[4] for row in games if row[4] is not None]
+            if finished:
+                # 回看窗口内的对局会重复取到，由 _append 去重
+                self._finished_after = max(finished)
+            game_rows = np.array([row[:4] for row in games], dtype=np.int64).reshape(-1, 4)
+            moves = (
+                db.query(GameMove.game_id, GameMove.player_id, GameMove.x, GameMove.y)
+                .filter(GameMove.game_id.in_(query.with_entities(Game.id)))
+                .order_by(GameMove.game_id, GameMove.id)
+                .all()
+            )
+            self._append(game_rows, np.array(moves, dtype=np.int64).reshape(-1, 4))
+
+        if archive is not None:
+            game_ids = archive.game_ids()
+            game_rows, move_rows = [], []
+            for game_id in game_ids[self._archive_seen:]:
+                record = archive.get(game_id)
+                game_rows.append((game_id, record["player1_id"], record["player2_id"] or 0, record["winner_id"] or 0))
+                move_rows.extend((game_id, m["player_id"], m["x"], m["y"]) for m in record["moves"])
+            self._archive_seen = len(game_ids)
+            if game_rows:
+                self._append(
+                    np.array(game_rows, dtype=np.int64).reshape(-1, 4),
+                    np.array(move_rows, dtype=np.int64).reshape(-1, 4),
+                )
+
+    def _heatmap(self, cells: np.ndarray) -> List[List[int]]:
+        counts = np.bincount(cells[cells >= 0], minlength=BOARD_SIZE * BOARD_SIZE)
+        return counts.reshape(BOARD_SIZE, BOARD_SIZE).tolist()
+
+    def _favourite(self, cells: np.ndarray) -> Optional[Tuple[int, int]]:
+        cells = cells[cells >= 0]
+        if not len(cells):
+            return None
+        cell = int(np.bincount(cells).argmax())
+        return cell % BOARD_SIZE, cell // BOARD_SIZE
+
+    def summary(self) -> dict:
+        """
+        全局统计：先手优势、开局热力图、平均步数、获胜方向
+        """
+        if self._summary is not None:
+            return self._summary
+        c = self.columns
+        decided = c["winner"] > 0
+        directions = np.bincount(c["direction"][c["direction"] >= 0], minlength=len(DIRECTIONS))
+        result = {
+            "games": int(len(c["ids"])),
+            "first_move_win_rate": float((c["winner"][decided] == 1).mean()) if decided.any() else 0.0,
+            "average_length": float(c["length"].mean()) if len(c["length"]) else 0.0,
+            "win_directions": dict(zip(DIRECTIONS, directions.tolist())),
+            "opening_heatmap": self._heatmap(c["opening1"]),
+            "move_heatmap": self.cell_counts.reshape(BOARD_SIZE, BOARD_SIZE).tolist(),
+        }
+        self._summary = result
+        return result
+
+    def player(self, user_id: int) -> dict:
+        """
+        单个用户的统计
+        """
+        if user_id in self._players:
+            self._players.move_to_end(user_id)
+            return self._players[user_id]
+        c = self.columns
+        as1 = c["player1"] == user_id
+        as2 = c["player2"] == user_id
+        played = as1 | as2
+        wins = int(((c["winner"] == 1) & as1).sum() + ((c["winner"] == 2) & as2).sum())
+        games = int(played.sum())
+        result = {
+            "user_id": user_id,
+            "games": games,
+            "wins": wins,
+            "win_rate": wins / games if games else 0.0,
+            "average_length": float(c["length"][played].mean()) if games else 0.0,
+            "favourite_opening": self._favourite(np.concatenate([c["opening1"][as1], c["opening2"][as2]])),
+        }
+        # 只缓存有对局的用户，并限制条数，避免任意 user_id 的请求占满内存
+        if games:
+            self._players[user_id] = result
+            if len(self._players) > PLAYER_CACHE_SIZE:
+                self._players.popitem(last=False)
+        return result
+
+    def stats(self, archive=None, user_id: Optional[int] = None) -> Tuple[dict, Optional[dict]]:
+        """
+        增量加载后返回全局统计和用户统计。第一次加载整个历史较慢，应在线程中调用
+        """
+        with self._lock:
+            db = SessionLocal()
+            try:
+                self.refresh(db, archive)
+            finally:
+                db.close()
+            return self.summary(), self.player(user_id) if user_id is not None else None
+
+# 创建全局统计实例
+analytics = GameAnalytics()
@@ -0,0 +1,224 @@
+import logging
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session, selectinload
+
+from ..models.game import Game, GameMove, GameStatus
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PATH = os.getenv("GAME_ARCHIVE_PATH", "./game_archive.dat")
+
+# 记录头：magic, game_id, player1_id, player2_id, current_turn_id, winner_id,
+# created_at, started_at, finished_at, 移动数量
+# 可空的 id 用 0 表示，可空的时间用 NaN 表示
+_MAGIC = b"GMAR"
+_HEADER = struct.Struct("<4sqqqqqdddI")
+# 单步移动：move_id, 玩家编号(1/2), x, y, created_at
+_MOVE = struct.Struct("<qBBBd")
+
+def _pack_time(value: Optional[datetime]) -> float:
+    if value is None:
+        return float("nan")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _unpack_time(value: float) -> Optional[datetime]:
+    if value != value:  # NaN
+        return None
+    # 与 datetime.utcnow() 写入的值保持一致，返回不带时区的 UTC 时间
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+class GameArchive:
+    """
+    已结束对局的只追加归档文件，通过 mmap 读取
+    """
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        # 索引 {game_id: 记录偏移}
+        self.index: Dict[int, int] = {}
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+        self._scanned = 0
+
+    def _refresh(self):
+        """
+        文件被其他进程追加后，重新映射并只扫描新增部分
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if size == self._mapped_size:
+            return
+
+        if self._mmap is not None:
+            self._mmap.close()
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped_size = size
+
+        offset = self._scanned
+        while offset + _HEADER.size <= size:
+            header = _HEADER.unpack_from(self._mmap, offset)
+            if header[0] != _MAGIC:
+                raise ValueError(f"Corrupt game archive at offset {offset}")
+            end = offset + _HEADER.size + header[-1] * _MOVE.size
+            if end > size:
+                # 写了一半的记录，等下次刷新
+                break
+            self.index[header[1]] = offset
+            offset = end
+        self._scanned = offset
+
+    def __contains__(self, game_id: int) -> bool:
+        if game_id not in self.index:
+            self._refresh()
+        return game_id in self.index
+
+    def game_ids(self) -> List[int]:
+        self._refresh()
+        return list(self.index)
+
+    def append(self, game: Game):
+        """
+        把一局已结束的对局追加到归档文件
+        """
+        if game.id in self:
+            return
+
+        player_number = {game.player1_id: 1, game.player2_id: 2}
+        chunks = [_HEADER.pack(
+            _MAGIC,
+            game.id,
+            game.player1_id or 0,
+            game.player2_id or 0,
+            game.current_turn_id or 0,
+            game.winner_id or 0,
+            _pack_time(game.created_at),
+            _pack_time(game.started_at),
+            _pack_time(game.finished_at),
+            len(game.moves),
+        )]
+        for move in sorted(game.moves, key=lambda m: m.id):
+            chunks.append(_MOVE.pack(
+                move.id, player_number[move.player_id], move.x, move.y, _pack_time(move.created_at)
+            ))
+
+        with open(self.path, "ab") as f:
+            f.write(b"".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get(self, game_id: int) -> Optional[dict]:
+        """
+        读取归档的对局，返回与 GameDetail 字段一致的字典（不含用户对象）
+        """
+        if game_id not in self:
+            return None
+
+        offset = self.index[game_id]
+        (_, _, player1_id, player2_id, current_turn_id, winner_id,
+         created_at, started_at, finished_at, move_count) = _HEADER.unpack_from(self._mmap, offset)
+        player_ids = {1: player1_id, 2: player2_id}
+
+        board = [[0 for _ in range(15)] for _ in range(15)]
+        moves: List[dict] = []
+        for move_id, player, x, y, move_time in _MOVE.iter_unpack(
+            memoryview(self._mmap)[offset + _HEADER.size:offset + _HEADER.size + move_count * _MOVE.size]
+        ):
+            board[y][x] = player
+            moves.append({
+                "id": move_id,
+                "game_id": game_id,
+                "player_id": player_ids[player],
+                "x": x,
+                "y": y,
+                "created_at": _unpack_time(move_time),
+            })
+
+        return {
+            "id": game_id,
+            "status": GameStatus.FINISHED.value,
+            "player1_id": player1_id,
+            "player2_id": player2_id or None,
+            "current_turn_id": current_turn_id or None,
+            "winner_id": winner_id or None,
+            "board": board,
+            "created_at": _unpack_time(created_at),
+            "started_at": _unpack_time(started_at),
+            "finished_at": _unpack_time(finished_at),
+            "moves": moves,
+        }
+
+def _reuses_ids(db: Session) -> bool:
+    """
+    旧版 create_all 建的 SQLite 表没有 AUTOINCREMENT，会复用 max(rowid)+1
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return False
+    sql = db.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'games'")).scalar()
+    return "AUTOINCREMENT" not in (sql or "").upper()
+
+def _moves_complete(game: Game) -> bool:
+    """
+    归档只保存移动记录，读取时据此重建棋盘。移动记录不全的对局归档后会丢失棋子
+    """
+    stones = sum(1 for row in game.board or [] for cell in row if cell)
+    return len(game.moves) == stones
+
+def compact_finished_games(db: Session, archive: GameArchive, batch_size: int = 500) -> int:
+    """
+    把已结束的对局从 games/game_moves 移到归档文件，返回归档的对局数
+    """
+    query = db.query(Game).options(selectinload(Game.moves)).filter(Game.status == GameStatus.FINISHED)
+    if _reuses_ids(db):
+        # 删除最大 id 的对局后新对局会复用这个 id，与归档冲突，所以保留它
+        max_id = db.query(func.max(Game.id)).scalar()
+        if max_id is not None:
+            query = query.filter(Game.id < max_id)
+
+    total = 0
+    last_id = 0
+    while True:
+        # 跳过的对局留在表中，按 id 往后翻页
+        games = query.filter(Game.id > last_id).order_by(Game.id).limit(batch_size).all()
+        if not games:
+            return total
+        last_id = games[-1].id
+
+        # 先落盘再删除，中途失败重跑时已归档的对局会被跳过
+        game_ids = []
+        for game in games:
+            if not _moves_complete(game):
+                logger.warning("Game %s move records do not match its board, not archiving it", game.id)
+                continue
+            archive.append(game)
+            game_ids.append(game.id)
+
+        if game_ids:
+            db.query(GameMove).filter(GameMove.game_id.in_(game_ids)).delete(synchronize_session=False)
+            db.query(Game).filter(Game.id.in_(game_ids)).delete(synchronize_session=False)
+            db.commit()
+        db.expunge_all()
+        total += len(game_ids)
+
+# 创建全局归档实例
+archive = GameArchive()
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+    from ..models.user import User  # noqa: F401  注册 users 表供外键解析
+
+    db = SessionLocal()
+    try:
+        count = compact_finished_games(db, archive)
+    finally:
+        db.close()
+    print(f"Archived {count} finished games to {archive.path}")
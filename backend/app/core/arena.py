@@ -0,0 +1,200 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..models.game import Game, GameMove, GameStatus, PositionEntry
+from . import positions
+from .rules import BOARD_SIZE, check_win, empty_board, is_valid_move
+
+Move = Tuple[int, int]
+Policy = Callable[[List[List[int]], int, random.Random], Move]
+
+def _empty_cells(board: List[List[int]]) -> List[Move]:
+    return [(x, y) for y in range(BOARD_SIZE) for x in range(BOARD_SIZE) if board[y][x] == 0]
+
+def _neighbour_cells(board: List[List[int]]) -> List[Move]:
+    """
+    与已有棋子相邻的空位，棋盘为空时返回天元
+    """
+    cells = set()
+    for y in range(BOARD_SIZE):
+        for x in range(BOARD_SIZE):
+            if board[y][x]:
+                for dy in (-1, 0, 1):
+                    for dx in (-1, 0, 1):
+                        if is_valid_move(board, x + dx, y + dy):
+                            cells.add((x + dx, y + dy))
+    if not cells:
+        return [(BOARD_SIZE // 2, BOARD_SIZE // 2)]
+    return sorted(cells)
+
+def random_policy(board: List[List[int]], player: int, rng: random.Random) -> Move:
+    """
+    在所有空位中随机落子
+    """
+    return rng.choice(_empty_cells(board))
+
+def neighbour_policy(board: List[List[int]], player: int, rng: random.Random) -> Move:
+    """
+    在已有棋子旁边随机落子
+    """
+    return rng.choice(_neighbour_cells(board))
+
+def greedy_policy(board: List[List[int]], player: int, rng: random.Random) -> Move:
+    """
+    能赢就赢，对方能赢就堵，否则在已有棋子旁边随机落子
+    """
+    cells = _neighbour_cells(board)
+    for target in (player, 3 - player):
+        for x, y in cells:
+            board[y][x] = target
+            won = check_win(board, x, y, target)
+            board[y][x] = 0
+            if won:
+                return x, y
+    return rng.choice(cells)
+
+POLICIES: Dict[str, Policy] = {
+    "random": random_policy,
+    "neighbour": neighbour_policy,
+    "greedy": greedy_policy,
+}
+
+def play_game(policy1: str, policy2: str, seed: int) -> Tuple[List[Move], Optional[int]]:
+    """
+    无界面对弈一局，返回 (落子序列, 胜方编号)，平局时胜方为 None
+    """
+    rng = random.Random(seed)
+    policies = {1: POLICIES[policy1], 2: POLICIES[policy2]}
+    board = empty_board()
+    moves: List[Move] = []
+    player = 1  # 玩家1先手
+    while len(moves) < BOARD_SIZE * BOARD_SIZE:
+        x, y = policies[player](board, player, rng)
+        if not is_valid_move(board, x, y):
+            raise ValueError(f"Policy {policies[player].__name__} played an illegal move {(x, y)}")
+        board[y][x] = player
+        moves.append((x, y))
+        if check_win(board, x, y, player):
+            return moves, player
+        player = 3 - player
+    return moves, None
+
+def _play_game(args: Tuple[str, str, int]) -> Tuple[List[Move], Optional[int]]:
+    return play_game(*args)
+
+def run_arena(
+    policy1: str,
+    policy2: str,
+    games: int,
+    workers: Optional[int] = None,
+    seed: int = 0
+) -> Tuple[List[Tuple[List[Move], Optional[int]]], dict]:
+    """
+    用进程池批量对弈，返回 (所有对局, 统计结果)
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = [(policy1, policy2, seed + i) for i in range(games)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_play_game, tasks, chunksize=max(1, games // (workers * 4))))
+    elapsed = time.perf_counter() - start
+
+    winners = [winner for _, winner in results]
+    stats = {
+        "games": games,
+        "player1_wins": winners.count(1),
+        "player2_wins": winners.count(2),
+        "draws": winners.count(None),
+        "player1_win_rate": winners.count(1) / games if games else 0.0,
+        "average_length": sum(len(moves) for moves, _ in results) / games if games else 0.0,
+        "games_per_second": games / elapsed if elapsed else 0.0,
+    }
+    return results, stats
+
+def save_games(
+    db: Session,
+    results: List[Tuple[List[Move], Optional[int]]],
+    player1_id: int,
+    player2_id: int,
+    batch_size: int = 500
+) -> int:
+    """
+    把对局批量写入 games/game_moves（以及局面索引），返回写入的对局数
+    """
+    player_ids = {1: player1_id, 2: player2_id}
+    for i in range(0, len(results), batch_size):
+        batch = results[i:i + batch_size]
+        now = datetime.utcnow()
+        game_rows = []
+        for moves, winner in batch:
+            board = empty_board()
+            for ply, (x, y) in enumerate(moves):
+                board[y][x] = ply % 2 + 1
+            game_rows.append({
+                "status": GameStatus.FINISHED,
+                "player1_id": player1_id,
+                "player2_id": player2_id,
+                "current_turn_id": player_ids[len(moves) % 2 + 1] if winner is None else player_ids[winner],
+                "winner_id": player_ids.get(winner),
+                "board": board,
+                "created_at": now,
+                "started_at": now,
+                "finished_at": now,
+            })
+        game_ids = db.execute(
+            insert(Game).returning(Game.id, sort_by_parameter_order=True), game_rows
+        ).scalars().all()
+
+        move_rows = []
+        position_rows = []
+        for game_id, (moves, winner) in zip(game_ids, batch):
+            for ply, (x, y) in enumerate(moves):
+                move_rows.append({
+                    "game_id": game_id,
+                    "player_id": player_ids[ply % 2 + 1],
+                    "x": x,
+                    "y": y,
+                    "created_at": now,
+                })
+            position_rows.extend(positions.game_entries(game_id, winner, moves))
+        db.execute(insert(GameMove), move_rows)
+        db.execute(insert(PositionEntry), position_rows)
+        db.commit()
+    return len(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Gomoku self-play arena")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--p1", choices=POLICIES, default="greedy")
+    parser.add_argument("--p2", choices=POLICIES, default="greedy")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", action="store_true", help="insert the games into the database")
+    parser.add_argument("--player1-id", type=int)
+    parser.add_argument("--player2-id", type=int)
+    args = parser.parse_args()
+    if args.save and (args.player1_id is None or args.player2_id is None):
+        parser.error("--save requires --player1-id and --player2-id")
+
+    results, stats = run_arena(args.p1, args.p2, args.games, args.workers, args.seed)
+    for key, value in stats.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+
+    if args.save:
+        from ..database import SessionLocal
+        from ..models.user import User  # noqa: F401  注册 users 表供外键解析
+
+        db = SessionLocal()
+        try:
+            count = save_games(db, results, args.player1_id, args.player2_id)
+        finally:
+            db.close()
+        print(f"Saved {count} games")
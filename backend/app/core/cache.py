@@ -0,0 +1,90 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import Response, status
+
+# 已结束对局响应缓存的总字节数上限
+MAX_BYTES = int(os.getenv("REPLAY_CACHE_BYTES", str(64 * 1024 * 1024)))
+# 缓存条目的有效期（秒）。用户资料修改只会清除当前进程的缓存，
+# 其他 worker 中的旧数据最多保留这么久
+TTL = float(os.getenv("REPLAY_CACHE_TTL", "300"))
+# 响应里带有玩家的用户名和邮箱，这些可以修改：
+# 只允许客户端自己缓存，每次使用前用 ETag 重新验证
+CACHE_CONTROL = "private, no-cache"
+
+class ResponseCache:
+    """
+    按总字节数限制大小的 LRU，保存编码好的响应体和 ETag
+    """
+    def __init__(self, max_bytes: int = MAX_BYTES, ttl: float = TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        # {key: (body, etag, expires_at)}
+        self.entries: "OrderedDict[int, Tuple[bytes, str, float]]" = OrderedDict()
+        # 响应中包含的用户 {user_id: {key}}，用户资料修改时据此清除
+        self.keys_by_user: Dict[int, Set[int]] = {}
+        self.users_by_key: Dict[int, Set[int]] = {}
+
+    def get(self, key: int) -> Optional[Tuple[bytes, str]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] < time.monotonic():
+            self.evict(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[0], entry[1]
+
+    def put(self, key: int, body: bytes, user_ids: Iterable[Optional[int]] = ()) -> Tuple[bytes, str]:
+        etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+        if len(body) > self.max_bytes:
+            return body, etag
+        self.evict(key)
+        self.entries[key] = (body, etag, time.monotonic() + self.ttl)
+        self.size += len(body)
+        users = {user_id for user_id in user_ids if user_id is not None}
+        self.users_by_key[key] = users
+        for user_id in users:
+            self.keys_by_user.setdefault(user_id, set()).add(key)
+        while self.size > self.max_bytes:
+            self.evict(next(iter(self.entries)))
+        return body, etag
+
+    def evict(self, key: int):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry[0])
+        for user_id in self.users_by_key.pop(key, ()):
+            keys = self.keys_by_user.get(user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_user[user_id]
+
+    def evict_user(self, user_id: int):
+        """
+        用户资料修改后，清除包含该用户的缓存
+        """
+        for key in list(self.keys_by_user.get(user_id, ())):
+            self.evict(key)
+
+def cached_response(entry: Tuple[bytes, str], if_none_match: Optional[str]) -> Response:
+    """
+    根据 If-None-Match 返回 304 或完整的 JSON 响应
+    """
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # If-None-Match 使用弱比较，忽略 W/ 前缀
+        if "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# 创建全局回放缓存实例
+replay_cache = ResponseCache()
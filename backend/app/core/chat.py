@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+
+from ..database import SessionLocal
+from ..models.chat import ChatMessage
+from ..schemas.ws_events import ChatBatchEvent, ChatHistoryEvent, ChatMessageEvent
+from .ws_manager import manager
+
+logger = logging.getLogger(__name__)
+
+# 每个房间在内存中保留的聊天记录条数
+HISTORY_SIZE = int(os.getenv("CHAT_HISTORY_SIZE", "50"))
+# 令牌桶：每秒补充的消息数和最大突发数
+RATE = float(os.getenv("CHAT_RATE", "1"))
+BURST = int(os.getenv("CHAT_BURST", "5"))
+# 写入数据库的间隔（秒）和触发提前写入的条数
+FLUSH_INTERVAL = float(os.getenv("CHAT_FLUSH_INTERVAL", "2"))
+FLUSH_BATCH_SIZE = int(os.getenv("CHAT_FLUSH_BATCH_SIZE", "200"))
+# 合并广播的时间窗口（毫秒），0 表示每条消息立即广播
+COALESCE_MS = int(os.getenv("CHAT_COALESCE_MS", "0"))
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def idle(self) -> bool:
+        """
+        令牌已补满，可以丢弃
+        """
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+class ChatPipeline:
+    def __init__(self):
+        # 每个用户的令牌桶 {user_id: TokenBucket}
+        self.buckets: Dict[int, TokenBucket] = {}
+        # 每个房间最近的聊天记录 {game_id: deque[ChatMessageEvent]}
+        self.history: Dict[int, Deque[ChatMessageEvent]] = {}
+        # 等待写入数据库的消息 (game_id, event)
+        self.pending: List[Tuple[int, ChatMessageEvent]] = []
+        # 等待合并广播的消息 {game_id: [ChatMessageEvent]}
+        self.outgoing: Dict[int, List[ChatMessageEvent]] = {}
+        # 事件循环只弱引用任务，这里保存引用，避免合并广播的任务被回收
+        self._broadcasts: Set[asyncio.Task] = set()
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    def start(self):
+        """
+        在应用启动时调用，启动后台写入任务
+        """
+        self._flush_requested = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """
+        在应用关闭时调用，写入剩余的消息
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        # 等待合并窗口内的消息发送出去
+        if self._broadcasts:
+            await asyncio.gather(*self._broadcasts, return_exceptions=True)
+        await self.flush()
+
+    def allow(self, user_id: int) -> bool:
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            bucket = self.buckets[user_id] = TokenBucket(RATE, BURST)
+        return bucket.take()
+
+    def _room_history(self, game_id: int) -> Deque[ChatMessageEvent]:
+        if game_id not in self.history:
+            # 房间第一次用到时从数据库加载最近的记录
+            db = SessionLocal()
+            try:
+                rows = (
+                    db.query(ChatMessage)
+                    # 同一条查询取出发送者，避免每行再查一次用户
+                    .options(joinedload(ChatMessage.sender))
+                    .filter(ChatMessage.game_id == game_id)
+                    .order_by(ChatMessage.id.desc())
+                    .limit(HISTORY_SIZE)
+                    .all()
+                )
+                self.history[game_id] = deque(
+                    (
+                        ChatMessageEvent(
+                            sender_id=row.sender_id,
+                            sender_name=row.sender.username,
+                            message=row.message,
+                            timestamp=row.created_at
+                        )
+                        for row in reversed(rows)
+                    ),
+                    maxlen=HISTORY_SIZE
+                )
+                # 还没写入数据库的消息
+                self.history[game_id].extend(event for pending_id, event in self.pending if pending_id == game_id)
+            finally:
+                db.close()
+        return self.history[game_id]
+
+    async def send_history(self, websocket: WebSocket, game_id: int):
+        """
+        把房间的聊天记录发给刚连接的客户端
+        """
+        history = self._room_history(game_id)
+        if history:
+            event = ChatHistoryEvent(messages=list(history))
+            await manager.send_personal_message(websocket, event.model_dump(mode="json"))
+
+    async def post(self, game_id: int, event: ChatMessageEvent):
+        """
+        记录一条聊天消息并广播
+        """
+        self._room_history(game_id).append(event)
+        self.pending.append((game_id, event))
+        if len(self.pending) >= FLUSH_BATCH_SIZE and self._flush_requested is not None:
+            self._flush_requested.set()
+
+        if COALESCE_MS <= 0:
+            await manager.broadcast_to_game(game_id, event.model_dump(mode="json"))
+            return
+
+        # 窗口内的消息合并成一帧广播
+        if game_id in self.outgoing:
+            self.outgoing[game_id].append(event)
+        else:
+            self.outgoing[game_id] = [event]
+            task = asyncio.create_task(self._broadcast_later(game_id))
+            self._broadcasts.add(task)
+            task.add_done_callback(self._broadcasts.discard)
+
+    async def _broadcast_later(self, game_id: int):
+        await asyncio.sleep(COALESCE_MS / 1000)
+        messages = self.outgoing.pop(game_id, [])
+        if messages:
+            event = ChatBatchEvent(messages=messages)
+            await manager.broadcast_to_game(game_id, event.model_dump(mode="json"))
+
+    def forget(self, game_id: int):
+        """
+        房间没有连接时释放内存中的聊天记录
+        """
+        self.history.pop(game_id, None)
+
+    async def flush(self):
+        """
+        把积累的消息批量写入数据库
+        """
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        rows = [
+            {
+                "game_id": game_id,
+                "sender_id": event.sender_id,
+                "message": event.message,
+                "created_at": event.timestamp,
+            }
+            for game_id, event in batch
+        ]
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception:
+            # 写入失败时放回队列，下次重试
+            self.pending[:0] = batch
+            raise
+
+    def _write(self, rows: List[dict]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(ChatMessage), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to persist chat messages")
+            # 清理令牌已补满的桶
+            for user_id in [user_id for user_id, bucket in self.buckets.items() if bucket.idle()]:
+                del self.buckets[user_id]
+
+# 创建全局聊天实例
+chat = ChatPipeline()
@@ -0,0 +1,181 @@
+import random
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, selectinload
+
+from ..models.game import Game, GameStatus, PositionEntry
+from .rules import BOARD_SIZE
+
+# 棋盘的 8 种对称变换 (x, y) -> (x', y')
+_N = BOARD_SIZE - 1
+SYMMETRIES = [
+    lambda x, y: (x, y),
+    lambda x, y: (_N - x, y),
+    lambda x, y: (x, _N - y),
+    lambda x, y: (_N - x, _N - y),
+    lambda x, y: (y, x),
+    lambda x, y: (_N - y, x),
+    lambda x, y: (y, _N - x),
+    lambda x, y: (_N - y, _N - x),
+]
+# 每种变换的逆变换下标
+INVERSE = [0, 1, 2, 3, 4, 6, 5, 7]
+
+# Zobrist 随机数：固定种子，保证不同进程算出的哈希一致
+# 取 63 位，异或结果能放进有符号的 BIGINT
+_rng = random.Random(20241215)
+_ZOBRIST = [
+    [[_rng.getrandbits(63) for _ in range(3)] for _ in range(BOARD_SIZE)]
+    for _ in range(BOARD_SIZE)
+]
+# 预先算好每种变换下的随机数 {s: [y][x][player]}
+_SYM_ZOBRIST = [
+    [[_ZOBRIST[sym(x, y)[1]][sym(x, y)[0]] for x in range(BOARD_SIZE)] for y in range(BOARD_SIZE)]
+    for sym in SYMMETRIES
+]
+
+def board_hashes(board: List[List[int]]) -> List[int]:
+    """
+    计算棋盘在 8 种对称变换下的哈希
+    """
+    hashes = [0] * len(SYMMETRIES)
+    for y, row in enumerate(board):
+        for x, player in enumerate(row):
+            if player:
+                for s, table in enumerate(_SYM_ZOBRIST):
+                    hashes[s] ^= table[y][x][player]
+    return hashes
+
+def play(hashes: List[int], x: int, y: int, player: int) -> List[int]:
+    """
+    在 (x, y) 落子后的哈希，增量更新
+    """
+    return [h ^ table[y][x][player] for h, table in zip(hashes, _SYM_ZOBRIST)]
+
+def canonical(hashes: List[int]) -> Tuple[int, int]:
+    """
+    返回 (规范哈希, 对应的变换下标)
+    """
+    s = min(range(len(hashes)), key=hashes.__getitem__)
+    return hashes[s], s
+
+def _entry(game_id: int, ply: int, hashes: List[int], x: int, y: int, result: Optional[int] = None) -> dict:
+    position_hash, s = canonical(hashes)
+    # 下一步也存成规范方向上的坐标
+    cx, cy = SYMMETRIES[s](x, y)
+    return {
+        "position_hash": position_hash,
+        "game_id": game_id,
+        "ply": ply,
+        "x": cx,
+        "y": cy,
+        "result": result,
+    }
+
+def index_move(db: Session, game: Game, x: int, y: int):
+    """
+    在落子前调用，记录当前局面以及下出的这一步
+    """
+    ply = sum(1 for row in game.board for cell in row if cell)
+    db.add(PositionEntry(**_entry(game.id, ply, board_hashes(game.board), x, y)))
+
+def _winner(status: str, winner_id: Optional[int], player1_id: int) -> Optional[int]:
+    if status != GameStatus.FINISHED or winner_id is None:
+        return None
+    return 1 if winner_id == player1_id else 2
+
+def record_result(db: Session, game: Game):
+    """
+    对局结束时写入胜方编号，供胜率统计
+    """
+    # SessionLocal 不会自动 flush，先写入本步 index_move 添加的行，否则 UPDATE 覆盖不到它
+    db.flush()
+    db.query(PositionEntry).filter(PositionEntry.game_id == game.id).update(
+        {"result": _winner(game.status, game.winner_id, game.player1_id)}, synchronize_session=False
+    )
+
+def game_entries(game_id: int, winner: Optional[int], moves: Iterable[Tuple[int, int]]) -> List[dict]:
+    hashes = [0] * len(SYMMETRIES)
+    entries = []
+    for ply, (x, y) in enumerate(moves):
+        entries.append(_entry(game_id, ply, hashes, x, y, winner))
+        hashes = play(hashes, x, y, ply % 2 + 1)
+    return entries
+
+def rebuild_position_index(db: Session, archive=None, batch_size: int = 500) -> int:
+    """
+    离线重建整个局面索引（包括进行中的对局和归档文件中的对局），返回写入的行数
+    """
+    db.query(PositionEntry).delete(synchronize_session=False)
+    total = 0
+    last_id = 0
+    while True:
+        games = (
+            db.query(Game)
+            .options(selectinload(Game.moves))
+            .filter(Game.id > last_id)
+            .order_by(Game.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not games:
+            break
+        rows = []
+        for game in games:
+            winner = _winner(game.status, game.winner_id, game.player1_id)
+            moves = sorted(game.moves, key=lambda m: m.id)
+            rows.extend(game_entries(game.id, winner, ((m.x, m.y) for m in moves)))
+        if rows:
+            db.execute(insert(PositionEntry), rows)
+        total += len(rows)
+        last_id = games[-1].id
+        db.expunge_all()
+
+    if archive is not None:
+        rows = []
+        for game_id in archive.game_ids():
+            record = archive.get(game_id)
+            winner = _winner(record["status"], record["winner_id"], record["player1_id"])
+            rows.extend(game_entries(game_id, winner, ((m["x"], m["y"]) for m in record["moves"])))
+            if len(rows) >= batch_size * 50:
+                db.execute(insert(PositionEntry), rows)
+                total += len(rows)
+                rows = []
+        if rows:
+            db.execute(insert(PositionEntry), rows)
+            total += len(rows)
+
+    db.commit()
+    return total
+
+def unresolved_games(db: Session) -> List[int]:
+    """
+    检查索引：返回已结束但仍有行没有写入胜负的对局 id
+    """
+    rows = (
+        db.query(PositionEntry.game_id)
+        .join(Game, Game.id == PositionEntry.game_id)
+        .filter(Game.status == GameStatus.FINISHED, Game.winner_id.isnot(None), PositionEntry.result.is_(None))
+        .distinct()
+        .all()
+    )
+    return [row.game_id for row in rows]
+
+if __name__ == "__main__":
+    import sys
+
+    from ..database import SessionLocal
+    from ..models.user import User  # noqa: F401  注册 users 表供外键解析
+    from .archive import archive
+
+    db = SessionLocal()
+    try:
+        if "--check" in sys.argv:
+            game_ids = unresolved_games(db)
+            print(f"{len(game_ids)} finished games with missing results: {game_ids[:20]}")
+            sys.exit(1 if game_ids else 0)
+        count = rebuild_position_index(db, archive)
+    finally:
+        db.close()
+    print(f"Indexed {count} positions")
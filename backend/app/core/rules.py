@@ -0,0 +1,40 @@
+from typing import List
+
+BOARD_SIZE = 15
+
+def empty_board() -> List[List[int]]:
+    return [[0 for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+
+def is_valid_move(board: List[List[int]], x: int, y: int) -> bool:
+    """
+    检查落子位置是否在棋盘内且未被占用
+    """
+    return 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE and board[y][x] == 0
+
+def check_win(board: List[List[int]], x: int, y: int, player: int) -> bool:
+    """
+    检查是否获胜
+    """
+    directions = [
+        [(0, 1), (0, -1)],   # 垂直
+        [(1, 0), (-1, 0)],   # 水平
+        [(1, 1), (-1, -1)],  # 主对角线
+        [(1, -1), (-1, 1)]   # 副对角线
+    ]
+    
+    for dir_pair in directions:
+        count = 1  # 当前位置算一个
+        
+        # 检查每一对方向
+        for dx, dy in dir_pair:
+            # 在这个方向上继续找相同的棋子
+            curr_x, curr_y = x + dx, y + dy
+            while (0 <= curr_x < BOARD_SIZE and 
+                   0 <= curr_y < BOARD_SIZE and 
+                   board[curr_y][curr_x] == player):
+                count += 1
+                if count >= 5:
+                    return True
+                curr_x, curr_y = curr_x + dx, curr_y + dy
+    
+    return False
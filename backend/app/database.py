@@ -1,16 +1,83 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./game_platform.db")
+
+# 连接池配置
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# SQLite 写锁等待时间（毫秒）
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+# Postgres 单条语句超时（毫秒），0 表示不限制
+PG_STATEMENT_TIMEOUT = int(os.getenv("PG_STATEMENT_TIMEOUT", "0"))
+
+def _engine_kwargs(url: str) -> dict:
+    backend = make_url(url).get_backend_name()
+    kwargs = {"pool_pre_ping": POOL_PRE_PING}
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./game_platform.db"
+    if backend == "sqlite":
+        kwargs["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": SQLITE_BUSY_TIMEOUT / 1000,
+            # 每个连接缓存的预编译语句数
+            "cached_statements": 256,
+        }
+        # 内存数据库使用单连接池，不支持以下参数
+        if make_url(url).database in (None, "", ":memory:"):
+            return kwargs
+    elif backend == "postgresql" and PG_STATEMENT_TIMEOUT:
+        kwargs["connect_args"] = {"options": f"-c statement_timeout={PG_STATEMENT_TIMEOUT}"}
+
+    kwargs.update(
+        poolclass=QueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+    )
+    return kwargs
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL 模式下读写互不阻塞，synchronous=NORMAL 在 WAL 下仍然安全
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.close()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def pool_status() -> dict:
+    """
+    连接池使用情况
+    """
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # overflow() 在未用满 pool_size 时为负数
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": MAX_OVERFLOW,
+    }
+
 # 依赖项
 def get_db():
     db = SessionLocal()
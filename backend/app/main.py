@@ -1,32 +1,62 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text
+
+from .database import engine, pool_status
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 预先建立一个连接，避免第一个请求承担建连开销
+    # 表结构由迁移负责（alembic upgrade head），启动时不再检查
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    # 聊天消息的后台批量写入
+    from .core.chat import chat
+    chat.start()
+    yield
+    await chat.stop()
+    engine.dispose()
+
+def create_app() -> FastAPI:
+    """
+    创建应用实例，uvicorn 使用 --factory 启动
+    """
+    # 路由模块在这里才导入，导入 app.main 本身保持轻量
+    from .api.endpoints import auth, game, ws
+
+    app = FastAPI(
+        title="Game Platform API",
+        description="Game Platform RESTful API documentation",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+
+    # CORS设置
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # 在生产环境中应该设置具体的源
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # 注册路由
+    app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
+    app.include_router(game.router, prefix="/api/game", tags=["game"])
+    app.include_router(ws.router, prefix="/ws", tags=["websocket"])
+
+    @app.get("/")
+    async def root():
+        return {"message": "Welcome to Game Platform API"}
+
+    @app.get("/health/db")
+    async def database_health():
+        """
+        数据库连接池使用情况，用于调整连接池大小
+        """
+        return pool_status()
 
-from .database import engine, Base
-from .api.endpoints import auth, game, ws
-
-# 创建数据库表
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="Game Platform API",
-    description="Game Platform RESTful API documentation",
-    version="1.0.0"
-)
-
-# CORS设置
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # 在生产环境中应该设置具体的源
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# 注册路由
-app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-app.include_router(game.router, prefix="/api/game", tags=["game"])
-app.include_router(ws.router, prefix="/ws", tags=["websocket"])
-
-@app.get("/")
-async def root():
-    return {"message": "Welcome to Game Platform API"}
+    return app
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+
+from ..database import Base
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # 不加外键：对局归档后 games 中的行会被删除，聊天记录仍然保留
+    game_id = Column(Integer, index=True)
+    sender_id = Column(Integer, ForeignKey("users.id"))
+    message = Column(String)
+    created_at = Column(DateTime(timezone=True))
+
+    # 关系
+    sender = relationship("User", backref="chat_messages")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, JSON, Enum
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -12,6 +12,8 @@ class GameStatus(str, enum.Enum):
 
 class Game(Base):
     __tablename__ = "games"
+    # 对局归档后不复用 id，避免新对局与归档对局冲突
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     status = Column(String, default=GameStatus.WAITING)
@@ -36,6 +38,7 @@ class Game(Base):
 
 class GameMove(Base):
     __tablename__ = "game_moves"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     game_id = Column(Integer, ForeignKey("games.id"))
@@ -47,3 +50,20 @@ class GameMove(Base):
     # 关系
     game = relationship("Game", backref="moves")
     player = relationship("User", backref="moves")
+
+class PositionEntry(Base):
+    """
+    局面索引：每行是某局对局中的一个局面（规范化后的 Zobrist 哈希）及其下一步
+    """
+    __tablename__ = "position_index"
+
+    id = Column(Integer, primary_key=True)
+    position_hash = Column(BigInteger, index=True)
+    # 不加外键：对局归档后 games 中的行会被删除，索引仍然保留
+    game_id = Column(Integer, index=True)
+    ply = Column(Integer)
+    # 下一步，规范方向上的坐标
+    x = Column(Integer)
+    y = Column(Integer)
+    # 胜方编号 1/2，对局未结束时为空
+    result = Column(Integer, nullable=True)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from .user import User
 
@@ -44,3 +44,32 @@ class Game(GameBase):
 
 class GameDetail(Game):
     moves: List[GameMoveResponse] = []
+
+class ExplorerMove(BaseModel):
+    x: int
+    y: int
+    games: int
+    wins: int
+    win_rate: float
+
+class ExplorerResult(BaseModel):
+    position_hash: int
+    games: int
+    moves: List[ExplorerMove] = []
+
+class PlayerStats(BaseModel):
+    user_id: int
+    games: int
+    wins: int
+    win_rate: float
+    average_length: float
+    favourite_opening: Optional[Tuple[int, int]] = None
+
+class GameStats(BaseModel):
+    games: int
+    first_move_win_rate: float
+    average_length: float
+    win_directions: Dict[str, int]
+    opening_heatmap: List[List[int]]
+    move_heatmap: List[List[int]]
+    player: Optional[PlayerStats] = None
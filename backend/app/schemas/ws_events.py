@@ -32,6 +32,14 @@ class ChatMessageEvent(BaseModel):
     message: str
     timestamp: datetime
 
+class ChatHistoryEvent(BaseModel):
+    type: str = "chat_history"
+    messages: List[ChatMessageEvent]
+
+class ChatBatchEvent(BaseModel):
+    type: str = "chat_batch"
+    messages: List[ChatMessageEvent]
+
 class PlayerJoinEvent(BaseModel):
     player_id: int
     player_name: str
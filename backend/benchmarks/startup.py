@@ -0,0 +1,52 @@
+"""
+测量从 import 到应用就绪（lifespan 启动完成）的耗时
+
+在 backend 目录下运行：python benchmarks/startup.py [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 每次在新的解释器中运行，模拟 worker 冷启动
+_PROBE = """
+import asyncio, time
+start = time.perf_counter()
+from app.main import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(imported - start, created - start, ready - start)
+"""
+
+def measure(runs: int):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE],
+            cwd=BACKEND_DIR,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append([float(value) for value in output.split()])
+    return samples
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import-to-ready time of the API")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = measure(args.runs)
+    for index, label in enumerate(["import app.main", "create_app()", "lifespan ready"]):
+        values = [sample[index] * 1000 for sample in samples]
+        print(f"{label:<16} median {statistics.median(values):7.1f} ms  min {min(values):7.1f} ms  max {max(values):7.1f} ms")
@@ -1,7 +1,13 @@
 #!/bin/sh
 
+# 执行数据库迁移，失败时不启动服务
+if ! alembic upgrade head; then
+    echo "Database migration failed, not starting the server" >&2
+    exit 1
+fi
+
 # 启动 FastAPI 服务器在后台
-uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload &
+uvicorn app.main:create_app --factory --host 0.0.0.0 --port 8000 --reload &
 
 # 将控制权交给 CMD
 exec "$@"
@@ -0,0 +1,67 @@
+"""initial schema
+
+与旧版 Base.metadata.create_all 建出的表结构一致，已有数据库可以直接 stamp 到这个版本
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 18:18:28.124028
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+
+    op.create_table('games',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('player1_id', sa.Integer(), nullable=True),
+    sa.Column('player2_id', sa.Integer(), nullable=True),
+    sa.Column('current_turn_id', sa.Integer(), nullable=True),
+    sa.Column('winner_id', sa.Integer(), nullable=True),
+    sa.Column('board', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['current_turn_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['player1_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['player2_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['winner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_games_id'), 'games', ['id'], unique=False)
+
+    op.create_table('game_moves',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('game_id', sa.Integer(), nullable=True),
+    sa.Column('player_id', sa.Integer(), nullable=True),
+    sa.Column('x', sa.Integer(), nullable=True),
+    sa.Column('y', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+    sa.ForeignKeyConstraint(['player_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_game_moves_id'), 'game_moves', ['id'], unique=False)
+
+def downgrade():
+    op.drop_table('game_moves')
+    op.drop_table('games')
+    op.drop_table('users')
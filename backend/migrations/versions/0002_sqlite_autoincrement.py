@@ -0,0 +1,31 @@
+"""sqlite autoincrement for games and game_moves
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 18:40:00.000000
+"""
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# 对局归档后 SQLite 会复用 max(rowid)+1，需要重建表加上 AUTOINCREMENT
+# 其他数据库使用序列，不会复用 id
+_TABLES = ('games', 'game_moves')
+
+def _recreate(autoincrement: bool):
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in _TABLES:
+        with op.batch_alter_table(
+            table, recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}
+        ):
+            pass
+
+def upgrade():
+    _recreate(True)
+
+def downgrade():
+    _recreate(False)
@@ -0,0 +1,30 @@
+"""add position index
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 18:40:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('position_index',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('position_hash', sa.BigInteger(), nullable=True),
+    sa.Column('game_id', sa.Integer(), nullable=True),
+    sa.Column('ply', sa.Integer(), nullable=True),
+    sa.Column('x', sa.Integer(), nullable=True),
+    sa.Column('y', sa.Integer(), nullable=True),
+    sa.Column('result', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_position_index_game_id'), 'position_index', ['game_id'], unique=False)
+    op.create_index(op.f('ix_position_index_position_hash'), 'position_index', ['position_hash'], unique=False)
+
+def downgrade():
+    op.drop_table('position_index')